@@ -1,9 +1,12 @@
 """
 API routes for multi-tenant RAG application.
 """
+import asyncio
 import logging
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from typing import List, AsyncIterator, Dict, Any
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 from app.api.dependencies import get_tenant_id
 from app.models.schemas import (
     DocumentUploadRequest,
@@ -15,9 +18,9 @@ from app.models.schemas import (
     FileUploadResponse
 )
 from app.services.rag_service import rag_service
+from app.services.ingestion import pipeline_ingestor
 from app.services.pinecone_service import pinecone_service
 from app.core.config import settings
-from app.core.security import sanitize_text_input
 
 logger = logging.getLogger(__name__)
 
@@ -25,16 +28,18 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-@router.get("/health", response_model=HealthResponse, tags=["Health"])
+# Static health payload, serialized once at import
+_HEALTH_BODY = orjson.dumps(
+    HealthResponse(status="ok", environment=settings.app_env, version="1.0.0").model_dump()
+)
+
+
+@router.get("/health", responses={200: {"model": HealthResponse}}, tags=["Health"])
 async def health_check():
     """
     Health check endpoint for load balancers and monitoring.
     """
-    return HealthResponse(
-        status="ok",
-        environment=settings.app_env,
-        version="1.0.0"
-    )
+    return Response(content=_HEALTH_BODY, media_type="application/json")
 
 
 @router.post("/documents", response_model=DocumentUploadResponse, tags=["Documents"])
@@ -51,13 +56,11 @@ async def upload_document(
     - **metadata**: Optional metadata dictionary
     """
     try:
-        # Sanitize input
-        text = sanitize_text_input(request.text)
-        
-        # Upload document
-        document_id = rag_service.upload_document(
+        # request.text is already stripped and length-checked by the schema
+        document_id = await asyncio.to_thread(
+            rag_service.upload_document,
             tenant_id=tenant_id,
-            text=text,
+            text=request.text,
             metadata=request.metadata
         )
         
@@ -87,13 +90,12 @@ async def upload_files(
     Upload multiple PDF files for a specific tenant.
     
     Files will be parsed, chunked, embedded, and stored in the tenant's namespace.
+    Each file is stored as soon as it is processed, so when one file fails and
+    the request returns 500, files that already completed remain stored.
+    Retrying the upload overwrites them rather than duplicating them.
     
     - **files**: List of PDF files to upload
     """
-    from fastapi import UploadFile, File
-    from app.services.pdf_parser import pdf_parser
-    from app.models.schemas import FileUploadResponse
-    
     try:
         if not files:
             raise HTTPException(
@@ -101,52 +103,28 @@ async def upload_files(
                 detail="No files provided"
             )
         
-        all_chunks = []
-        files_processed = 0
-        
-        for file in files:
-            # Validate file type
-            if not file.filename.lower().endswith('.pdf'):
-                logger.warning(f"Skipping non-PDF file: {file.filename}")
-                continue
-            
-            # Read file content
-            file_content = await file.read()
-            
-            # Process PDF: extract text and chunk
-            chunks = pdf_parser.process_pdf(
-                file_content=file_content,
-                filename=file.filename,
-                additional_metadata={"uploaded_by": tenant_id}
-            )
-            
-            all_chunks.extend(chunks)
-            files_processed += 1
-            logger.info(f"Processed {file.filename}: {len(chunks)} chunks")
+        # Parse, embed and store through the staged ingestion pipeline
+        result = await pipeline_ingestor.ingest(tenant_id=tenant_id, files=files)
+        files_processed = result["files_processed"]
+        total_chunks = result["total_chunks"]
         
-        if not all_chunks:
+        if not total_chunks:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No valid PDF files found or no text could be extracted"
             )
         
-        # Upload all chunks in batch
-        document_ids = rag_service.upload_documents_batch(
-            tenant_id=tenant_id,
-            chunks=all_chunks
-        )
-        
         logger.info(
             f"Successfully uploaded {files_processed} files "
-            f"({len(all_chunks)} chunks) for tenant: {tenant_id}"
+            f"({total_chunks} chunks) for tenant: {tenant_id}"
         )
         
         return FileUploadResponse(
             success=True,
             files_processed=files_processed,
-            total_chunks=len(all_chunks),
-            document_ids=document_ids,
-            message=f"Successfully uploaded {files_processed} file(s) with {len(all_chunks)} chunks",
+            total_chunks=total_chunks,
+            document_ids=result["document_ids"],
+            message=f"Successfully uploaded {files_processed} file(s) with {total_chunks} chunks",
             tenant_id=tenant_id
         )
         
@@ -177,13 +155,11 @@ async def query_rag(
     - **top_k**: Number of documents to retrieve (optional, default: 5)
     """
     try:
-        # Sanitize input
-        question = sanitize_text_input(request.question, max_length=1000)
-        
-        # Execute RAG query
-        result = rag_service.query(
+        # request.question is already stripped and length-checked by the schema
+        result = await asyncio.to_thread(
+            rag_service.query,
             tenant_id=tenant_id,
-            question=question,
+            question=request.question,
             top_k=request.top_k
         )
         
@@ -204,19 +180,77 @@ async def query_rag(
         )
 
 
+@router.post("/query/stream", tags=["Query"])
+async def query_rag_stream(
+    request: QueryRequest,
+    tenant_id: str = Depends(get_tenant_id)
+):
+    """
+    Query the RAG system, streaming the answer as Server-Sent Events.
+    
+    Emits one `sources` event with the retrieved documents, then `token`
+    events carrying answer text as it is generated, then a final `done`
+    event. Failures after streaming has started are sent as an `error` event.
+    
+    - **question**: User question (required)
+    - **top_k**: Number of documents to retrieve (optional, default: 5)
+    """
+    events = rag_service.astream_query(
+        tenant_id=tenant_id,
+        question=request.question,
+        top_k=request.top_k
+    )
+    
+    # Run retrieval before the response starts so its failures still map to a 500
+    try:
+        first = await events.__anext__()
+    except Exception as e:
+        logger.error(f"Failed to process query: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process query: {str(e)}"
+        )
+    
+    async def sse() -> AsyncIterator[bytes]:
+        try:
+            yield _sse_event("sources", first)
+            async for event in events:
+                yield _sse_event("token", event)
+            yield _sse_event("done", {})
+            logger.info(f"Streaming query completed for tenant: {tenant_id}")
+        except Exception as e:
+            logger.error(f"Failed to stream query: {str(e)}")
+            yield _sse_event("error", {"detail": f"Failed to process query: {str(e)}"})
+    
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Event."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
 @router.delete("/tenant", response_model=TenantDeleteResponse, tags=["Tenant"])
 async def delete_tenant_data(
-    tenant_id: str = Depends(get_tenant_id)
+    tenant_id: str = Depends(get_tenant_id),
+    return_count: bool = Query(False, description="Report how many documents were deleted")
 ):
     """
     Delete all data for a tenant (offboarding).
     
     This will permanently delete all documents in the tenant's namespace.
-    This action cannot be undone.
+    This action cannot be undone. documents_deleted is only filled in when
+    return_count is set, since counting costs an extra Pinecone round-trip.
     """
     try:
         # Delete tenant data
-        documents_deleted = pinecone_service.delete_tenant_data(tenant_id)
+        documents_deleted = await asyncio.to_thread(
+            pinecone_service.delete_tenant_data, tenant_id, return_count=return_count
+        )
         
         logger.info(f"Deleted all data for tenant: {tenant_id}")
         
@@ -245,7 +279,7 @@ async def get_tenant_stats(
     Returns the number of documents stored for the tenant.
     """
     try:
-        stats = pinecone_service.get_namespace_stats(tenant_id)
+        stats = await asyncio.to_thread(pinecone_service.get_namespace_stats, tenant_id)
         
         return {
             "tenant_id": tenant_id,
@@ -269,7 +303,7 @@ async def list_tenant_documents(
     List all unique filenames for a tenant.
     """
     try:
-        filenames = pinecone_service.list_unique_filenames(tenant_id)
+        filenames = await asyncio.to_thread(pinecone_service.list_unique_filenames, tenant_id)
         return {"tenant_id": tenant_id, "documents": filenames}
     except Exception as e:
         logger.error(f"Failed to list documents: {str(e)}")
@@ -288,7 +322,9 @@ async def delete_tenant_document(
     Delete a specific document by filename for a tenant.
     """
     try:
-        pinecone_service.delete_document_by_filename(tenant_id, filename)
+        await asyncio.to_thread(
+            pinecone_service.delete_document_by_filename, tenant_id, filename
+        )
         return {"success": True, "message": f"Document {filename} deleted", "tenant_id": tenant_id}
     except Exception as e:
         logger.error(f"Failed to delete document: {str(e)}")
@@ -2,7 +2,7 @@
 Configuration management using Pydantic Settings.
 Loads and validates environment variables at startup.
 """
-from functools import lru_cache
+from functools import cached_property, lru_cache
 from typing import List
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -29,6 +29,7 @@ class Settings(BaseSettings):
     pinecone_api_key: str = Field(..., description="Pinecone API key")
     pinecone_index_name: str = Field(default="multi-tenant-rag", description="Pinecone index name")
     pinecone_environment: str = Field(default="us-east-1", description="Pinecone environment")
+    pinecone_pool_threads: int = Field(default=16, description="Concurrent Pinecone upsert requests")
     
     # Google Gemini
     google_api_key: str = Field(..., description="Google API key for Gemini")
@@ -38,6 +39,9 @@ class Settings(BaseSettings):
     huggingface_api_token: str = Field(default="", description="HuggingFace API token (optional)")
     embedding_model: str = Field(default="sentence-transformers/all-MiniLM-L6-v2", description="Embedding model")
     embedding_dimension: int = Field(default=384, description="Embedding dimension")
+    embedding_max_seq_length: int = Field(
+        default=256, description="Token limit per text; matches the sentence-transformers model config"
+    )
     
     # LLM Settings
     max_tokens: int = Field(default=1000, description="Maximum tokens for LLM response")
@@ -57,14 +61,14 @@ class Settings(BaseSettings):
     # Logging
     log_level: str = Field(default="INFO", description="Logging level")
     
-    @property
+    @cached_property
     def is_production(self) -> bool:
-        """Check if running in production mode."""
+        """Check if running in production mode (computed once)."""
         return self.app_env.lower() == "production"
     
-    @property
+    @cached_property
     def cors_origins(self) -> List[str]:
-        """Parse CORS origins from comma-separated string."""
+        """Parse CORS origins from comma-separated string (computed once)."""
         return [origin.strip() for origin in self.allowed_origins.split(",")]
 
 
@@ -2,9 +2,14 @@
 Security utilities for tenant authentication and validation.
 """
 import re
+import string
 from typing import Optional
 from fastapi import HTTPException, status
 
+# Built once at import; used on every authenticated request
+_TENANT_CHARS = frozenset(string.ascii_letters + string.digits + "_-")
+_NS_RE = re.compile(r'[^a-z0-9_-]')
+
 
 class SecurityError(HTTPException):
     """Custom exception for security-related errors."""
@@ -40,13 +45,13 @@ def validate_tenant_id(tenant_id: Optional[str]) -> str:
         raise SecurityError("X-Tenant-ID header cannot be empty")
     
     # Validate format: alphanumeric, hyphens, underscores only
-    if not re.match(r'^[a-zA-Z0-9_-]+$', tenant_id):
+    if not _TENANT_CHARS.issuperset(tenant_id):
         raise SecurityError(
             "Invalid tenant ID format. Only alphanumeric characters, hyphens, and underscores are allowed."
         )
     
     # Length validation
-    if len(tenant_id) < 3 or len(tenant_id) > 64:
+    if not 3 <= len(tenant_id) <= 64:
         raise SecurityError("Tenant ID must be between 3 and 64 characters")
     
     return tenant_id
@@ -66,7 +71,7 @@ def sanitize_namespace(tenant_id: str) -> str:
     namespace = tenant_id.lower()
     
     # Replace any remaining special characters with underscores
-    namespace = re.sub(r'[^a-z0-9_-]', '_', namespace)
+    namespace = _NS_RE.sub('_', namespace)
     
     return namespace
 
@@ -75,6 +80,9 @@ def sanitize_text_input(text: str, max_length: int = 50000) -> str:
     """
     Sanitize text input to prevent injection attacks.
     
+    Request bodies are already validated by the Pydantic schemas; use this
+    for text arriving through other entry points.
+    
     Args:
         text: Input text to sanitize
         max_length: Maximum allowed text length
@@ -85,14 +93,14 @@ def sanitize_text_input(text: str, max_length: int = 50000) -> str:
     Raises:
         HTTPException: If text is too long or empty
     """
-    if not text or not text.strip():
+    text = text.strip() if text else ""
+    
+    if not text:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Text input cannot be empty"
         )
     
-    text = text.strip()
-    
     if len(text) > max_length:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -5,10 +5,14 @@ import logging
 import structlog
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api.routes import router
 from app.services.pinecone_service import pinecone_service
+from app.services.embeddings import embedding_service
+from app.services.ingestion import pipeline_ingestor
+from app.services.pdf_parser import pdf_parser
 
 
 # Configure structured logging
@@ -66,10 +70,18 @@ async def lifespan(app: FastAPI):
         logger.error(f"Failed to connect to Pinecone: {str(e)}")
         raise
     
+    # Warm up the embedding model before serving traffic
+    embedding_service.warmup()
+    
+    # Start the ingestion workers on the serving loop
+    pipeline_ingestor.start()
+    
     yield
     
     # Shutdown
     logger.info(f"Shutting down {settings.app_name}")
+    await pipeline_ingestor.stop()
+    pdf_parser.shutdown()
 
 
 # Create FastAPI application
@@ -79,6 +91,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if not settings.is_production else None,
     redoc_url="/redoc" if not settings.is_production else None,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -115,5 +128,8 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.host,
         port=settings.port,
-        reload=settings.debug
+        reload=settings.debug,
+        # "auto" picks uvloop and httptools when installed; uvloop is not on Windows
+        loop="auto",
+        http="auto"
     )
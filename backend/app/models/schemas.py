@@ -1,31 +1,28 @@
 """
 Pydantic models for request/response validation.
 """
-from typing import List, Optional
-from pydantic import BaseModel, Field, field_validator
+from typing import Annotated, List, Optional
+from pydantic import BaseModel, Field, StringConstraints
+
+
+# Stripped, non-empty strings validated inside pydantic-core. Fields of
+# these types need no further sanitize_text_input pass in the routes.
+NonEmptyText = Annotated[
+    str, StringConstraints(strip_whitespace=True, min_length=1, max_length=50000)
+]
+QuestionText = Annotated[
+    str, StringConstraints(strip_whitespace=True, min_length=1, max_length=1000)
+]
 
 
 class DocumentUploadRequest(BaseModel):
     """Request model for document upload."""
     
-    text: str = Field(
-        ...,
-        description="Document text content",
-        min_length=1,
-        max_length=50000
-    )
+    text: NonEmptyText = Field(..., description="Document text content")
     metadata: Optional[dict] = Field(
         default=None,
         description="Optional metadata for the document"
     )
-    
-    @field_validator('text')
-    @classmethod
-    def validate_text(cls, v: str) -> str:
-        """Ensure text is not empty after stripping."""
-        if not v.strip():
-            raise ValueError("Text cannot be empty or whitespace only")
-        return v.strip()
 
 
 class DocumentUploadResponse(BaseModel):
@@ -40,26 +37,13 @@ class DocumentUploadResponse(BaseModel):
 class QueryRequest(BaseModel):
     """Request model for RAG query."""
     
-    question: str = Field(
-        ...,
-        description="User question",
-        min_length=1,
-        max_length=1000
-    )
+    question: QuestionText = Field(..., description="User question")
     top_k: Optional[int] = Field(
         default=None,
         description="Number of documents to retrieve (overrides default)",
         ge=1,
         le=20
     )
-    
-    @field_validator('question')
-    @classmethod
-    def validate_question(cls, v: str) -> str:
-        """Ensure question is not empty after stripping."""
-        if not v.strip():
-            raise ValueError("Question cannot be empty or whitespace only")
-        return v.strip()
 
 
 class QueryResponse(BaseModel):
@@ -77,7 +61,9 @@ class TenantDeleteResponse(BaseModel):
     success: bool = Field(..., description="Deletion success status")
     message: str = Field(..., description="Success message")
     tenant_id: str = Field(..., description="Deleted tenant identifier")
-    documents_deleted: int = Field(..., description="Number of documents deleted")
+    documents_deleted: Optional[int] = Field(
+        None, description="Number of documents deleted, if requested with return_count"
+    )
 
 
 class HealthResponse(BaseModel):
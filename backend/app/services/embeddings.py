@@ -1,30 +1,126 @@
 """
-Embedding generation service using HuggingFace Sentence Transformers.
+Embedding generation service using fastembed (ONNX Runtime).
 """
+import asyncio
+import hashlib
 import logging
-from typing import List
-from sentence_transformers import SentenceTransformer
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from numba import njit
+from fastembed import TextEmbedding
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
 
+@njit(fastmath=True, cache=True)
+def _l2_normalize(M):
+    """
+    Divide each row of a float32 matrix by its L2 norm, in place.
+    
+    Serial on purpose: it is called from several threads at once, which
+    Numba's default parallel threading layer does not allow.
+    """
+    for i in range(M.shape[0]):
+        norm = 0.0
+        for j in range(M.shape[1]):
+            norm += M[i, j] * M[i, j]
+        if norm > 0.0:
+            inv = 1.0 / np.sqrt(norm)
+            for j in range(M.shape[1]):
+                M[i, j] *= inv
+
+
+def _dedupe(texts: List[str]) -> Tuple[List[str], Optional[np.ndarray]]:
+    """
+    Collapse exact duplicate texts.
+    
+    Returns the distinct texts in first-seen order and, if anything was
+    collapsed, the index of each input's distinct text (else None).
+    """
+    index: Dict[str, int] = {}
+    inverse = [index.setdefault(text, len(index)) for text in texts]
+    if len(index) == len(texts):
+        return texts, None
+    return list(index), np.asarray(inverse, dtype=np.intp)
+
+
 class EmbeddingService:
-    """Service for generating text embeddings using HuggingFace."""
+    """Service for generating text embeddings using fastembed."""
     
     def __init__(self):
-        """Initialize HuggingFace Sentence Transformer model."""
+        """Initialize fastembed ONNX embedding model."""
         self.model_name = settings.embedding_model
+        
+        # LRU cache of single-text embeddings; encoding is deterministic per model
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_size = 1024
+        self._cache_lock = threading.Lock()
+        
         logger.info(f"Loading embedding model: {self.model_name}")
         
         try:
-            self.model = SentenceTransformer(self.model_name)
+            self.model = TextEmbedding(model_name=self.model_name)
+            # fastembed truncates at the tokenizer's limit (512 for MiniLM),
+            # sentence-transformers at the model's max_seq_length; match the latter
+            # so vectors stay comparable with ones already stored in Pinecone
+            self.model.model.tokenizer.enable_truncation(
+                max_length=settings.embedding_max_seq_length
+            )
             logger.info(f"Successfully loaded model: {self.model_name}")
         except Exception as e:
             logger.error(f"Failed to load embedding model: {str(e)}")
             raise
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def warmup(self):
+        """
+        Run a throwaway encode so ONNX Runtime session setup and memory
+        arena allocation happen at startup rather than on the first request.
+        """
+        self._encode(["warmup"] * 8)
+        logger.info("Embedding model warmed up")
+    
+    def _encode_into(
+        self,
+        texts: List[str],
+        out: np.ndarray,
+        rows: Sequence[int],
+        batch_size: int = 64
+    ) -> None:
+        """
+        Encode texts and write each vector straight into a preallocated buffer.
+        
+        Vectors are copied once, from the model output into ``out[rows[j]]``,
+        with no intermediate list, stack or reorder copy.
+        
+        Args:
+            texts: List of input texts to embed
+            out: float32 buffer of shape (N, dimension)
+            rows: Destination row in ``out`` for each text
+            batch_size: Number of texts per ONNX Runtime call
+        """
+        for j, embedding in enumerate(self.model.embed(texts, batch_size=batch_size)):
+            out[rows[j]] = embedding
+    
+    def _encode(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """
+        Encode texts with the underlying model.
+        
+        Args:
+            texts: List of input texts to embed
+            batch_size: Number of texts per ONNX Runtime call
+            
+        Returns:
+            L2-normalized float32 array of shape (len(texts), dimension)
+        """
+        out = np.empty((len(texts), settings.embedding_dimension), dtype=np.float32)
+        self._encode_into(texts, out, range(len(texts)), batch_size)
+        _l2_normalize(out)
+        return out
+    
+    def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text.
         
@@ -32,37 +128,118 @@ class EmbeddingService:
             text: Input text to embed
             
         Returns:
-            List of floats representing the embedding vector
+            float16 array representing the embedding vector
         """
+        key = hashlib.blake2b(text.encode(), digest_size=16).digest()
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached.copy()
+        
         try:
-            embedding = self.model.encode(text, convert_to_numpy=True)
-            embedding_list = embedding.tolist()
-            logger.debug(f"Generated embedding with dimension: {len(embedding_list)}")
-            return embedding_list
+            embedding = self._encode([text])[0].astype(np.float16)
+            logger.debug(f"Generated embedding with dimension: {embedding.shape[0]}")
+            
+            with self._cache_lock:
+                self._cache[key] = embedding.copy()
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+            
+            return embedding
             
         except Exception as e:
             logger.error(f"Failed to generate embedding: {str(e)}")
             raise
     
-    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    def generate_embeddings_batch(
+        self,
+        texts: List[str],
+        batch_size: int = 64
+    ) -> np.ndarray:
         """
         Generate embeddings for multiple texts in a batch.
         
+        Duplicate texts are encoded once. Texts are encoded in length-sorted
+        order so each micro-batch is padded to a similar sequence length;
+        results are returned in input order.
+        
         Args:
             texts: List of input texts to embed
+            batch_size: Number of texts per forward pass
             
         Returns:
-            List of embedding vectors
+            float16 array of shape (len(texts), dimension)
         """
         try:
-            embeddings = self.model.encode(
-                texts,
-                convert_to_numpy=True,
-                show_progress_bar=len(texts) > 10
-            )
-            embeddings_list = [emb.tolist() for emb in embeddings]
-            logger.info(f"Generated {len(embeddings_list)} embeddings in batch")
-            return embeddings_list
+            unique, inverse = _dedupe(texts)
+            order = sorted(range(len(unique)), key=lambda i: len(unique[i]))
+            
+            # Rows land directly at their position in the caller's order
+            embeddings = np.empty((len(unique), settings.embedding_dimension), dtype=np.float32)
+            self._encode_into([unique[i] for i in order], embeddings, order, batch_size)
+            _l2_normalize(embeddings)
+            result = embeddings.astype(np.float16)
+            if inverse is not None:
+                result = result[inverse]
+            
+            logger.info(f"Generated {len(result)} embeddings in batch")
+            return result
+            
+        except Exception as e:
+            logger.error(f"Failed to generate batch embeddings: {str(e)}")
+            raise
+    
+    async def agenerate_embeddings_batch(
+        self,
+        texts: List[str],
+        max_concurrency: int = 4,
+        sub_batch: int = 256
+    ) -> np.ndarray:
+        """
+        Generate embeddings for multiple texts without blocking the event loop.
+        
+        Duplicate texts are encoded once. Length-sorted texts are split into
+        sub-batches that are encoded on worker threads, at most
+        ``max_concurrency`` at a time.
+        
+        Args:
+            texts: List of input texts to embed
+            max_concurrency: Maximum number of sub-batches encoded concurrently
+            sub_batch: Number of texts per sub-batch
+            
+        Returns:
+            float16 array of shape (len(texts), dimension)
+        """
+        if not texts:
+            return np.empty((0, settings.embedding_dimension), dtype=np.float16)
+        
+        try:
+            unique, inverse = _dedupe(texts)
+            order = sorted(range(len(unique)), key=lambda i: len(unique[i]))
+            sorted_texts = [unique[i] for i in order]
+            semaphore = asyncio.Semaphore(max_concurrency)
+            
+            # Sub-batches write disjoint rows of one shared buffer
+            embeddings = np.empty((len(unique), settings.embedding_dimension), dtype=np.float32)
+            
+            async def encode(start: int) -> None:
+                end = start + sub_batch
+                async with semaphore:
+                    await asyncio.to_thread(
+                        self._encode_into, sorted_texts[start:end], embeddings, order[start:end]
+                    )
+            
+            await asyncio.gather(*[
+                encode(i) for i in range(0, len(sorted_texts), sub_batch)
+            ])
+            _l2_normalize(embeddings)
+            result = embeddings.astype(np.float16)
+            if inverse is not None:
+                result = result[inverse]
+            
+            logger.info(f"Generated {len(result)} embeddings in async batch")
+            return result
             
         except Exception as e:
             logger.error(f"Failed to generate batch embeddings: {str(e)}")
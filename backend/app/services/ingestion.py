@@ -0,0 +1,299 @@
+"""
+Staged ingestion pipeline for PDF uploads.
+Overlaps parsing, chunking, embedding and upserting through bounded queues.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, BinaryIO, Optional, Union
+from fastapi import UploadFile
+from app.services.embeddings import embedding_service
+from app.services.pdf_parser import pdf_parser
+from app.services.rag_service import rag_service
+
+logger = logging.getLogger(__name__)
+
+
+class _IngestJob:
+    """Bookkeeping for one PDF moving through the pipeline."""
+
+    __slots__ = ("tenant_id", "filename", "file_content", "future", "pending", "document_ids")
+
+    def __init__(
+        self,
+        tenant_id: str,
+        filename: str,
+        file_content: Optional[Union[bytes, BinaryIO]]
+    ):
+        self.tenant_id = tenant_id
+        self.filename = filename
+        self.file_content = file_content
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.pending = 0
+        self.document_ids: List[str] = []
+
+    def resolve(self, document_ids: List[str]):
+        """Resolve the job with its document IDs unless it already finished."""
+        if not self.future.done():
+            self.future.set_result(document_ids)
+
+    def fail(self, error: BaseException):
+        """Resolve the job with an error unless it already finished."""
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class PipelineIngestor:
+    """
+    Parse -> Chunk -> Embed -> Upsert pipeline for uploaded PDFs.
+
+    Each stage is served by persistent worker tasks and hands work to the
+    next through a bounded queue, so parsing, chunking, embedding and
+    Pinecone upserts for many PDFs overlap instead of running back to back.
+    Full queues apply backpressure. A failure only fails the PDFs it touched;
+    the workers keep serving everything else.
+
+    Workers are bound to the event loop that started them and are restarted
+    if the pipeline is used from a different loop.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = 8,
+        parse_workers: int = os.cpu_count() or 4,
+        embed_batch: int = 32,
+        upsert_batch: int = 100
+    ):
+        """
+        Initialize pipeline sizing.
+
+        Args:
+            queue_size: Maximum items buffered between two stages
+            parse_workers: Number of PDFs parsed concurrently
+            embed_batch: Maximum chunks per embedding micro-batch
+            upsert_batch: Maximum vectors per upsert round
+        """
+        self.queue_size = queue_size
+        self.parse_workers = parse_workers
+        self.embed_batch = embed_batch
+        self.upsert_batch = upsert_batch
+        # Parse workers block a thread while their pages are on the process pool;
+        # keep them off asyncio's default executor, which serves the other routes
+        self._parse_executor = ThreadPoolExecutor(
+            max_workers=parse_workers, thread_name_prefix="pdf-parse"
+        )
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Create the stage queues and start the workers on the running loop."""
+        loop = asyncio.get_running_loop()
+        if self._workers and self._loop is loop:
+            return
+        if self._workers:
+            # Workers from another (possibly closed) loop can never run here
+            logger.warning("Restarting ingestion pipeline on a new event loop")
+            self._discard_workers()
+        self._loop = loop
+
+        self._q_parse: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._q_chunk: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._q_embed: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size * self.embed_batch)
+        self._q_upsert: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+
+        self._workers = [
+            *[asyncio.ensure_future(self._parse_worker()) for _ in range(self.parse_workers)],
+            asyncio.ensure_future(self._chunk_worker()),
+            asyncio.ensure_future(self._embed_worker()),
+            asyncio.ensure_future(self._upsert_worker()),
+        ]
+        logger.info(f"Started ingestion pipeline with {self.parse_workers} parse workers")
+
+    async def stop(self):
+        """Cancel the workers."""
+        if self._loop is asyncio.get_running_loop():
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        else:
+            self._discard_workers()
+        self._workers = []
+        self._loop = None
+
+    def _discard_workers(self):
+        """Cancel workers that belong to another event loop."""
+        for worker in self._workers:
+            loop = worker.get_loop()
+            if not worker.done() and not loop.is_closed():
+                loop.call_soon_threadsafe(worker.cancel)
+        self._workers = []
+
+    async def ingest_pdf(
+        self,
+        file_content: Union[bytes, BinaryIO],
+        filename: str,
+        tenant_id: str
+    ) -> List[str]:
+        """
+        Parse, embed and store one PDF for a tenant.
+
+        Args:
+            file_content: PDF file content as bytes or a readable binary stream.
+                Streams are only read once a parse worker picks the PDF up.
+            filename: Name of the PDF file
+            tenant_id: Tenant identifier
+
+        Returns:
+            List of document IDs for the stored chunks
+        """
+        self.start()
+        job = _IngestJob(tenant_id, filename, file_content)
+        await self._q_parse.put(job)
+        return await job.future
+
+    async def ingest(self, tenant_id: str, files: List[UploadFile]) -> Dict[str, Any]:
+        """
+        Parse, embed and store uploaded PDF files for a tenant.
+
+        PDFs are stored independently as they finish, so if one file fails
+        the chunks of files that already completed stay in the namespace.
+        Re-uploading is safe: chunk IDs are content-addressed and overwrite.
+
+        Args:
+            tenant_id: Tenant identifier
+            files: Uploaded files; non-PDF files are skipped
+
+        Returns:
+            Dictionary with files_processed, total_chunks and document_ids
+        """
+        pdf_files = []
+        for file in files:
+            # Validate file type
+            if not file.filename.lower().endswith('.pdf'):
+                logger.warning(f"Skipping non-PDF file: {file.filename}")
+                continue
+            pdf_files.append(file)
+
+        async def ingest_file(file: UploadFile) -> List[str]:
+            # Hand over the spooled upload itself; only PDFs being parsed
+            # are read into memory
+            await file.seek(0)
+            return await self.ingest_pdf(file.file, file.filename, tenant_id)
+
+        results = await asyncio.gather(
+            *[ingest_file(file) for file in pdf_files], return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        document_ids = [document_id for ids in results for document_id in ids]
+        logger.info(
+            f"Ingested {len(pdf_files)} files "
+            f"({len(document_ids)} chunks) for tenant: {tenant_id}"
+        )
+        return {
+            "files_processed": len(pdf_files),
+            "total_chunks": len(document_ids),
+            "document_ids": document_ids
+        }
+
+    async def _parse_worker(self):
+        """PDF bytes -> text; pages are extracted on PDFParser's process pool."""
+        while True:
+            job = await self._q_parse.get()
+            try:
+                text = await asyncio.get_running_loop().run_in_executor(
+                    self._parse_executor,
+                    pdf_parser.extract_text_from_pdf,
+                    job.file_content,
+                    job.filename
+                )
+                job.file_content = None
+                await self._q_chunk.put((job, text))
+            except Exception as e:
+                job.fail(e)
+
+    async def _chunk_worker(self):
+        """Text -> chunks with metadata."""
+        while True:
+            job, text = await self._q_chunk.get()
+            try:
+                chunks = await asyncio.to_thread(
+                    pdf_parser.chunk_pdf_text,
+                    text,
+                    job.filename,
+                    {"uploaded_by": job.tenant_id}
+                )
+                logger.info(f"Processed {job.filename}: {len(chunks)} chunks")
+                if not chunks:
+                    job.resolve([])
+                    continue
+                job.pending = len(chunks)
+                for chunk in chunks:
+                    await self._q_embed.put((job, chunk))
+            except Exception as e:
+                job.fail(e)
+
+    async def _embed_worker(self):
+        """Chunks -> vectors, coalesced into micro-batches across PDFs."""
+        while True:
+            batch = [await self._q_embed.get()]
+            # Flush when the batch is full or nothing else is ready yet
+            while len(batch) < self.embed_batch and not self._q_embed.empty():
+                batch.append(self._q_embed.get_nowait())
+
+            try:
+                # Drop chunks of PDFs that already failed or were cancelled
+                batch = [(job, chunk) for job, chunk in batch if not job.future.done()]
+                if not batch:
+                    continue
+                embeddings = await embedding_service.agenerate_embeddings_batch(
+                    [chunk["text"] for _, chunk in batch]
+                )
+                await self._q_upsert.put((batch, embeddings))
+            except Exception as e:
+                for job, _ in batch:
+                    job.fail(e)
+
+    async def _upsert_worker(self):
+        """Vectors -> Pinecone, grouped per PDF so each lands in its tenant's namespace."""
+        while True:
+            rounds = [await self._q_upsert.get()]
+            size = len(rounds[0][0])
+            while size < self.upsert_batch and not self._q_upsert.empty():
+                rounds.append(self._q_upsert.get_nowait())
+                size += len(rounds[-1][0])
+
+            groups: Dict[_IngestJob, tuple] = {}
+            try:
+                for batch, embeddings in rounds:
+                    for (job, chunk), embedding in zip(batch, embeddings):
+                        chunks, vectors = groups.setdefault(job, ([], []))
+                        chunks.append(chunk)
+                        vectors.append(embedding)
+
+                for job, (chunks, vectors) in groups.items():
+                    if job.future.done():
+                        continue
+                    try:
+                        document_ids = await asyncio.to_thread(
+                            rag_service.store_chunks, job.tenant_id, chunks, vectors
+                        )
+                    except Exception as e:
+                        job.fail(e)
+                        continue
+                    job.document_ids.extend(document_ids)
+                    job.pending -= len(chunks)
+                    if job.pending <= 0:
+                        # The caller may have been cancelled during the upsert
+                        job.resolve(job.document_ids)
+            except Exception as e:
+                for batch, _ in rounds:
+                    for job, _ in batch:
+                        job.fail(e)
+
+
+# Global ingestion pipeline instance
+pipeline_ingestor = PipelineIngestor()
@@ -1,16 +1,118 @@
 """
 PDF parsing and text chunking service.
-Uses PyPDF2 for PDF parsing and custom text splitter.
+Uses PyMuPDF for PDF parsing and custom text splitter.
 """
 import logging
-from typing import List, Dict, Any
-from io import BytesIO
-from PyPDF2 import PdfReader
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, BinaryIO, Optional, Union
+import fitz
+import numpy as np
+from numba import njit
 from app.core.config import settings
+from app.services.pdf_worker import extract_pages
 
 logger = logging.getLogger(__name__)
 
 
+@njit(cache=True)
+def _is_space(c):
+    """Match str.isspace() for a single code point."""
+    if c <= 32:
+        return c == 32 or 9 <= c <= 13 or 28 <= c <= 31
+    if c < 133:
+        return False
+    return (
+        c == 133 or c == 160 or c == 5760 or 8192 <= c <= 8202
+        or c == 8232 or c == 8233 or c == 8239 or c == 8287 or c == 12288
+    )
+
+
+@njit(cache=True)
+def _find_splits(buf, chunk_size, chunk_overlap):
+    """
+    Compute (start, end) character spans for overlapping chunks.
+    
+    ``buf`` holds one integer code per character. Chunks break at the
+    rightmost sentence/line boundary (". ", "! ", "? ", "\\n\\n", "\\n") past
+    the overlap, else at the last space, else at chunk_size. Returned spans
+    are already stripped of surrounding whitespace; whitespace-only chunks
+    are dropped.
+    """
+    n = buf.shape[0]
+    
+    # Boundary end offsets: count first, then fill an exactly sized array
+    boundaries = np.empty(0, dtype=np.int64)
+    for fill in range(2):
+        nb = 0
+        i = 0
+        while i < n:
+            c = buf[i]
+            if (c == 46 or c == 33 or c == 63) and i + 1 < n and buf[i + 1] == 32:
+                i += 2
+            elif c == 10:
+                i += 2 if i + 1 < n and buf[i + 1] == 10 else 1
+            else:
+                i += 1
+                continue
+            if fill:
+                boundaries[nb] = i
+            nb += 1
+        if not fill:
+            boundaries = np.empty(nb, dtype=np.int64)
+    
+    spans = np.empty((n // max(1, chunk_size - chunk_overlap) + 16, 2), dtype=np.int64)
+    k = 0
+    start = 0
+    while start < n:
+        end = start + chunk_size
+        
+        # Breaks must land past the overlap so the next chunk moves forward
+        if end < n:
+            floor = start + chunk_overlap
+            j = np.searchsorted(boundaries, end, side="right") - 1
+            if j >= 0 and boundaries[j] > floor:
+                end = boundaries[j]
+            else:
+                # Look for word boundary
+                p = end - 1
+                while p >= floor and buf[p] != 32:
+                    p -= 1
+                if p >= floor:
+                    end = p + 1
+        
+        # Trim by index so the caller slices each chunk exactly once
+        lo = start
+        hi = min(end, n)
+        while lo < hi and _is_space(buf[lo]):
+            lo += 1
+        while hi > lo and _is_space(buf[hi - 1]):
+            hi -= 1
+        
+        if hi > lo:
+            if k == spans.shape[0]:
+                grown = np.empty((2 * k, 2), dtype=np.int64)
+                grown[:k] = spans[:k]
+                spans = grown
+            spans[k, 0] = lo
+            spans[k, 1] = hi
+            k += 1
+        
+        # Move start position with overlap
+        start = end - chunk_overlap if end < n else n
+    
+    return spans[:k]
+
+
+# Compile both buffer specializations at import rather than on first upload
+_find_splits(np.zeros(1, dtype=np.uint8), 2, 1)
+_find_splits(np.zeros(1, dtype=np.uint32), 2, 1)
+
+
 class SimpleTextSplitter:
     """Simple text splitter with overlap."""
     
@@ -23,40 +125,23 @@ class SimpleTextSplitter:
         if not text:
             return []
         
-        chunks = []
-        start = 0
-        text_length = len(text)
+        # One code unit per character, so kernel offsets index `text` directly
+        if text.isascii():
+            buf = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        else:
+            buf = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
         
-        while start < text_length:
-            end = start + self.chunk_size
-            
-            # Try to break at sentence or word boundary
-            if end < text_length:
-                # Look for sentence end
-                for sep in ['. ', '! ', '? ', '\n\n', '\n']:
-                    last_sep = text.rfind(sep, start, end)
-                    if last_sep != -1:
-                        end = last_sep + len(sep)
-                        break
-                else:
-                    # Look for word boundary
-                    last_space = text.rfind(' ', start, end)
-                    if last_space != -1:
-                        end = last_space + 1
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            # Move start position with overlap
-            start = end - self.chunk_overlap if end < text_length else text_length
-        
-        return chunks
+        spans = _find_splits(buf, self.chunk_size, self.chunk_overlap)
+        return [text[start:end] for start, end in spans.tolist()]
 
 
 class PDFParser:
     """Service for parsing PDFs and chunking text."""
     
+    # Shared across uploads so worker processes are only started once
+    _executor: Optional[ProcessPoolExecutor] = None
+    _executor_lock = threading.Lock()
+    
     def __init__(self):
         """Initialize PDF parser with text splitter."""
         self.text_splitter = SimpleTextSplitter(
@@ -68,12 +153,52 @@ class PDFParser:
             f"overlap={settings.chunk_overlap}"
         )
     
-    def extract_text_from_pdf(self, file_content: bytes, filename: str) -> str:
+    @classmethod
+    def _get_executor(cls) -> ProcessPoolExecutor:
+        """Return the process pool used for page extraction, creating it once."""
+        with cls._executor_lock:
+            if cls._executor is None:
+                # Never fork: the pool is first created from a worker thread of a
+                # process already running ONNX Runtime, Numba and event loop threads
+                if "forkserver" in multiprocessing.get_all_start_methods():
+                    context = multiprocessing.get_context("forkserver")
+                    # Workers only need fitz, not the Numba kernels in this module
+                    context.set_forkserver_preload(["app.services.pdf_worker"])
+                else:
+                    context = multiprocessing.get_context("spawn")
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    mp_context=context
+                )
+            return cls._executor
+    
+    @classmethod
+    def _replace_executor(cls, broken: ProcessPoolExecutor):
+        """Drop a pool that lost a worker so the next call starts a fresh one."""
+        with cls._executor_lock:
+            # Another thread may already have replaced it
+            if cls._executor is broken:
+                cls._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+    
+    @classmethod
+    def shutdown(cls):
+        """Shut down the page extraction process pool, if it was started."""
+        with cls._executor_lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=True, cancel_futures=True)
+                cls._executor = None
+    
+    def extract_text_from_pdf(
+        self,
+        file_content: Union[bytes, BinaryIO],
+        filename: str
+    ) -> str:
         """
         Extract text from PDF file.
         
         Args:
-            file_content: PDF file content as bytes
+            file_content: PDF file content as bytes or a readable binary stream
             filename: Name of the PDF file
             
         Returns:
@@ -83,19 +208,51 @@ class PDFParser:
             Exception: If PDF parsing fails
         """
         try:
-            pdf_file = BytesIO(file_content)
-            pdf_reader = PdfReader(pdf_file)
+            if not isinstance(file_content, (bytes, bytearray)):
+                file_content = file_content.read()
+            doc = fitz.open(stream=file_content, filetype="pdf")
+            try:
+                page_count = doc.page_count
+            finally:
+                doc.close()
             
-            text_parts = []
-            for page_num, page in enumerate(pdf_reader.pages, 1):
-                text = page.extract_text()
-                if text.strip():
-                    text_parts.append(text)
+            # Split pages into contiguous ranges, one per worker process
+            n = min(os.cpu_count() or 1, page_count)
+            ranges = [range(page_count * k // n, page_count * (k + 1) // n) for k in range(n)]
+            
+            # Workers read the PDF from shared memory instead of each being
+            # sent a pickled copy through the pool's pipe
+            length = len(file_content)
+            shm = shared_memory.SharedMemory(create=True, size=length)
+            try:
+                shm.buf[:length] = file_content
+                for attempt in range(2):
+                    executor = self._get_executor()
+                    try:
+                        futures = [
+                            executor.submit(extract_pages, shm.name, length, r)
+                            for r in ranges
+                        ]
+                        
+                        # Ranges were submitted in page order, so results concatenate in order
+                        pages = [pair for future in futures for pair in future.result()]
+                        break
+                    except BrokenProcessPool:
+                        # A page worker died (OOM kill, MuPDF crash); a broken pool
+                        # rejects every later submit, so replace it and retry once
+                        logger.warning(f"Page worker died while parsing {filename}, restarting pool")
+                        self._replace_executor(executor)
+                        if attempt:
+                            raise
+            finally:
+                shm.close()
+                shm.unlink()
+            text_parts = [text for _, text in pages if text.strip()]
             
             full_text = "\n\n".join(text_parts)
             logger.info(
                 f"Extracted {len(full_text)} characters from {filename} "
-                f"({len(pdf_reader.pages)} pages)"
+                f"({page_count} pages)"
             )
             
             return full_text
@@ -119,14 +276,14 @@ class PDFParser:
             # Split text into chunks
             chunks = self.text_splitter.split_text(text)
             
-            # Create chunk objects with metadata
+            # Create chunk objects with metadata; the shared part is resolved
+            # once and merged into each chunk's own dict
+            base_meta = metadata or {}
+            total = len(chunks)
             chunk_objects = []
             for i, chunk in enumerate(chunks):
-                chunk_metadata = {
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    **(metadata or {})
-                }
+                chunk_metadata = {"chunk_index": i, "total_chunks": total}
+                chunk_metadata.update(base_meta)
                 chunk_objects.append({
                     "text": chunk,
                     "metadata": chunk_metadata
@@ -141,7 +298,7 @@ class PDFParser:
     
     def process_pdf(
         self,
-        file_content: bytes,
+        file_content: Union[bytes, BinaryIO],
         filename: str,
         additional_metadata: Dict[str, Any] = None
     ) -> List[Dict[str, Any]]:
@@ -149,7 +306,7 @@ class PDFParser:
         Process PDF: extract text and chunk it.
         
         Args:
-            file_content: PDF file content as bytes
+            file_content: PDF file content as bytes or a readable binary stream
             filename: Name of the PDF file
             additional_metadata: Optional additional metadata
             
@@ -159,6 +316,25 @@ class PDFParser:
         # Extract text from PDF
         text = self.extract_text_from_pdf(file_content, filename)
         
+        return self.chunk_pdf_text(text, filename, additional_metadata)
+    
+    def chunk_pdf_text(
+        self,
+        text: str,
+        filename: str,
+        additional_metadata: Dict[str, Any] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Chunk text extracted from a PDF, attaching file metadata.
+        
+        Args:
+            text: Text extracted from the PDF
+            filename: Name of the PDF file
+            additional_metadata: Optional additional metadata
+            
+        Returns:
+            List of text chunks with metadata
+        """
         if not text.strip():
             raise Exception(f"No text could be extracted from {filename}")
         
@@ -175,6 +351,5 @@ class PDFParser:
         logger.info(f"Processed {filename}: {len(chunks)} chunks created")
         return chunks
 
-
 # Global PDF parser instance
 pdf_parser = PDFParser()
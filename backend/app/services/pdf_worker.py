@@ -0,0 +1,28 @@
+"""
+Page extraction entry point for PDFParser's worker processes.
+Kept free of Numba and app settings so each worker only imports fitz.
+"""
+from multiprocessing import shared_memory
+from typing import List, Sequence, Tuple
+import fitz
+
+
+def extract_pages(shm_name: str, length: int, page_indices: Sequence[int]) -> List[Tuple[int, str]]:
+    """
+    Extract text for a range of pages inside a worker process.
+    
+    Reads the PDF from the parent's shared memory block, opens it once per
+    range and returns (page_index, text) pairs.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # fitz.open only takes bytes, so copy out of the block once
+        file_content = bytes(shm.buf[:length])
+    finally:
+        shm.close()
+    
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    try:
+        return [(i, doc[i].get_text("text")) for i in page_indices]
+    finally:
+        doc.close()
@@ -2,14 +2,33 @@
 Pinecone vector database service with namespace-based tenant isolation.
 """
 import logging
+import threading
+import time
 import uuid
-from typing import List, Dict, Any, Optional
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Union
+import numpy as np
 from pinecone import Pinecone, ServerlessSpec
+from pinecone.config.openapi import OpenApiConfigFactory
+from pinecone.utils import normalize_host
 from app.core.config import settings
 from app.core.security import sanitize_namespace
 
 logger = logging.getLogger(__name__)
 
+# How long describe_index_stats results are reused, in seconds
+_STATS_TTL = 5.0
+
+
+def _to_values(embedding: Union[List[float], np.ndarray]) -> List[float]:
+    """
+    Convert an embedding to the float list the Pinecone REST client expects.
+    
+    The client validates vector values as a list of floats and does not take
+    ndarrays, so this is the single point where vectors leave NumPy.
+    """
+    return np.asarray(embedding, dtype=np.float32).tolist()
+
 
 class PineconeService:
     """Service for interacting with Pinecone vector database."""
@@ -19,23 +38,58 @@ class PineconeService:
         self.pc = Pinecone(api_key=settings.pinecone_api_key)
         self.index_name = settings.pinecone_index_name
         self.index = None
+        self._connect_lock = threading.Lock()
+        self._stats_cache = None
+        self._stats_cached_at = 0.0
+        # Bumped by writes so a refresh racing with a write is not cached
+        self._stats_generation = 0
+        # The describe_index_stats call in flight, shared by concurrent callers
+        self._stats_refresh: Optional[Future] = None
+        # Guards the cache fields; held only briefly, never across a network call
+        self._stats_lock = threading.Lock()
         logger.info(f"Initialized PineconeService for index: {self.index_name}")
     
     def connect(self):
         """Connect to Pinecone index."""
         try:
-            self.index = self.pc.Index(self.index_name)
+            host = self.pc.describe_index(self.index_name).host
+            
+            # Keep at least as many pooled keep-alive connections as there are
+            # async_req threads; never go below the SDK default (cpu_count * 5),
+            # which route handlers calling from worker threads also rely on
+            openapi_config = OpenApiConfigFactory.build(
+                api_key=settings.pinecone_api_key,
+                host=normalize_host(host)
+            )
+            openapi_config.connection_pool_maxsize = max(
+                openapi_config.connection_pool_maxsize, settings.pinecone_pool_threads
+            )
+            
+            # pool_threads sizes the SDK's worker pool for async_req upserts
+            self.index = self.pc.Index(
+                host=host,
+                pool_threads=settings.pinecone_pool_threads,
+                openapi_config=openapi_config
+            )
             logger.info(f"Connected to Pinecone index: {self.index_name}")
         except Exception as e:
             logger.error(f"Failed to connect to Pinecone index: {str(e)}")
             raise
     
+    def _ensure_index(self):
+        """Connect on first use; the lock keeps concurrent callers to one connect."""
+        if self.index is None:
+            with self._connect_lock:
+                if self.index is None:
+                    self.connect()
+    
     def upsert_document(
         self,
         tenant_id: str,
         text: str,
-        embedding: List[float],
-        metadata: Optional[Dict[str, Any]] = None
+        embedding: Union[List[float], np.ndarray],
+        metadata: Optional[Dict[str, Any]] = None,
+        document_id: Optional[str] = None
     ) -> str:
         """
         Upsert a document vector into tenant's namespace.
@@ -45,15 +99,15 @@ class PineconeService:
             text: Document text
             embedding: Document embedding vector
             metadata: Optional metadata
+            document_id: Optional vector ID; a random UUID is used if omitted
             
         Returns:
             Document ID
         """
-        if not self.index:
-            self.connect()
+        self._ensure_index()
         
         namespace = sanitize_namespace(tenant_id)
-        document_id = str(uuid.uuid4())
+        document_id = document_id or str(uuid.uuid4())
         
         # Prepare metadata
         doc_metadata = {
@@ -68,12 +122,13 @@ class PineconeService:
                 vectors=[
                     {
                         "id": document_id,
-                        "values": embedding,
+                        "values": _to_values(embedding),
                         "metadata": doc_metadata
                     }
                 ],
                 namespace=namespace
             )
+            self._invalidate_stats()
             logger.info(f"Upserted document {document_id} for tenant {tenant_id}")
             return document_id
             
@@ -81,10 +136,64 @@ class PineconeService:
             logger.error(f"Failed to upsert document: {str(e)}")
             raise
     
+    def upsert_documents_batch(
+        self,
+        tenant_id: str,
+        items: List[Dict[str, Any]],
+        batch_size: int = 100
+    ) -> List[str]:
+        """
+        Upsert many document vectors into tenant's namespace in batched calls.
+        
+        Args:
+            tenant_id: Tenant identifier
+            items: Dicts with "text", "embedding", optional "metadata" and "id"
+            batch_size: Number of vectors per upsert request
+            
+        Returns:
+            List of document IDs, in input order
+        """
+        self._ensure_index()
+        
+        namespace = sanitize_namespace(tenant_id)
+        
+        vectors = [
+            {
+                "id": item.get("id") or str(uuid.uuid4()),
+                "values": _to_values(item["embedding"]),
+                "metadata": {
+                    "text": item["text"],
+                    "tenant_id": tenant_id,
+                    **(item.get("metadata") or {})
+                }
+            }
+            for item in items
+        ]
+        
+        # One request per batch, with batches sent concurrently
+        try:
+            requests = [
+                self.index.upsert(
+                    vectors=vectors[i:i + batch_size],
+                    namespace=namespace,
+                    async_req=True
+                )
+                for i in range(0, len(vectors), batch_size)
+            ]
+            for request in requests:
+                request.get()
+            self._invalidate_stats()
+            logger.info(f"Upserted {len(vectors)} documents for tenant {tenant_id}")
+            return [vector["id"] for vector in vectors]
+            
+        except Exception as e:
+            logger.error(f"Failed to upsert documents: {str(e)}")
+            raise
+    
     def query_documents(
         self,
         tenant_id: str,
-        query_embedding: List[float],
+        query_embedding: Union[List[float], np.ndarray],
         top_k: int = 5
     ) -> List[Dict[str, Any]]:
         """
@@ -98,14 +207,13 @@ class PineconeService:
         Returns:
             List of matching documents with metadata
         """
-        if not self.index:
-            self.connect()
+        self._ensure_index()
         
         namespace = sanitize_namespace(tenant_id)
         
         try:
             results = self.index.query(
-                vector=query_embedding,
+                vector=_to_values(query_embedding),
                 top_k=top_k,
                 namespace=namespace,
                 include_metadata=True
@@ -128,29 +236,34 @@ class PineconeService:
             logger.error(f"Failed to query documents: {str(e)}")
             raise
     
-    def delete_tenant_data(self, tenant_id: str) -> int:
+    def delete_tenant_data(self, tenant_id: str, return_count: bool = False) -> Optional[int]:
         """
         Delete all data for a tenant (namespace).
         
         Args:
             tenant_id: Tenant identifier
+            return_count: Fetch the namespace's vector count before deleting.
+                Costs a describe_index_stats round-trip unless stats are cached.
             
         Returns:
-            Number of vectors deleted (estimated)
+            Number of vectors deleted (estimated) if return_count is True,
+            otherwise None
         """
-        if not self.index:
-            self.connect()
+        self._ensure_index()
         
         namespace = sanitize_namespace(tenant_id)
         
         try:
-            # Get namespace stats before deletion
-            stats = self.index.describe_index_stats()
-            namespace_stats = stats.namespaces.get(namespace, {})
-            vector_count = namespace_stats.get('vector_count', 0)
+            vector_count = None
+            if return_count:
+                # Get namespace stats before deletion
+                stats = self._describe_index_stats()
+                namespace_stats = stats.namespaces.get(namespace, {})
+                vector_count = namespace_stats.get('vector_count', 0)
             
             # Delete all vectors in namespace
             self.index.delete(delete_all=True, namespace=namespace)
+            self._invalidate_stats()
             
             logger.info(f"Deleted namespace {namespace} for tenant {tenant_id}")
             return vector_count
@@ -159,23 +272,74 @@ class PineconeService:
             logger.error(f"Failed to delete tenant data: {str(e)}")
             raise
     
+    def _describe_index_stats(self):
+        """
+        Get index-wide stats, reusing the last result for up to _STATS_TTL seconds.
+        
+        describe_index_stats returns every namespace, so its cost grows with the
+        number of tenants rather than with this tenant's data. Concurrent callers
+        share the result of one in-flight call instead of each issuing their own;
+        a result that raced a write is still returned, just not cached.
+        """
+        with self._stats_lock:
+            if (
+                self._stats_cache is not None
+                and time.monotonic() - self._stats_cached_at <= _STATS_TTL
+            ):
+                return self._stats_cache
+            refresh = self._stats_refresh
+            if refresh is not None:
+                owner = False
+            else:
+                owner = True
+                refresh = self._stats_refresh = Future()
+                generation = self._stats_generation
+        
+        if not owner:
+            # Another caller is already fetching; share its result
+            return refresh.result()
+        
+        try:
+            stats = self.index.describe_index_stats()
+        except BaseException as e:
+            with self._stats_lock:
+                self._stats_refresh = None
+            refresh.set_exception(e)
+            raise
+        
+        with self._stats_lock:
+            self._stats_refresh = None
+            # A write during the call may not be reflected, so don't cache it
+            if generation == self._stats_generation:
+                self._stats_cache = stats
+                self._stats_cached_at = time.monotonic()
+        refresh.set_result(stats)
+        return stats
+    
+    def _invalidate_stats(self):
+        """Drop cached index stats after a write so counts reflect it."""
+        with self._stats_lock:
+            self._stats_generation += 1
+            self._stats_cache = None
+    
     def get_namespace_stats(self, tenant_id: str) -> Dict[str, Any]:
         """
         Get statistics for a tenant's namespace.
         
+        Counts may be up to a few seconds stale.
+        
         Args:
             tenant_id: Tenant identifier
             
         Returns:
             Namespace statistics
         """
-        if not self.index:
-            self.connect()
+        self._ensure_index()
         
         namespace = sanitize_namespace(tenant_id)
         
         try:
-            stats = self.index.describe_index_stats()
+            stats = self._describe_index_stats()
             namespace_stats = stats.namespaces.get(namespace, {})
             return {
                 "namespace": namespace,
@@ -191,8 +355,7 @@ class PineconeService:
         Note: This is a scanning operation, potentially slow for many vectors.
         For small/medium datasets, we can query with a high top_k.
         """
-        if not self.index:
-            self.connect()
+        self._ensure_index()
         
         namespace = sanitize_namespace(tenant_id)
         
@@ -221,8 +384,7 @@ class PineconeService:
         """
         Delete all vectors associated with a specific filename in a namespace.
         """
-        if not self.index:
-            self.connect()
+        self._ensure_index()
         
         namespace = sanitize_namespace(tenant_id)
         
@@ -232,6 +394,7 @@ class PineconeService:
                 filter={"filename": filename},
                 namespace=namespace
             )
+            self._invalidate_stats()
             logger.info(f"Deleted document {filename} from namespace {namespace}")
             return 1
         except Exception as e:
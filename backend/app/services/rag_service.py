@@ -2,8 +2,11 @@
 RAG (Retrieval-Augmented Generation) service.
 Orchestrates the complete RAG pipeline: retrieval + generation.
 """
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Union
+import numpy as np
 import google.generativeai as genai
 from app.core.config import settings
 from app.services.embeddings import embedding_service
@@ -11,6 +14,43 @@ from app.services.pinecone_service import pinecone_service
 
 logger = logging.getLogger(__name__)
 
+NO_DOCUMENTS_ANSWER = (
+    "I don't have enough information to answer this question. "
+    "Please upload relevant documents first."
+)
+
+
+_PROMPT_PREFIX = """You are a helpful assistant that answers questions based on the provided context.
+Use only the information from the context to answer the question.
+If the context doesn't contain enough information to answer the question, say so clearly.
+Be concise and accurate in your responses.
+
+Context:
+"""
+
+
+def _chunk_id(tenant: str, text: str, idx: int, filename: str = "") -> str:
+    """
+    Derive a content-addressed ID for a chunk.
+    
+    Re-uploading the same chunk of the same file yields the same ID, so the
+    Pinecone upsert overwrites the existing vector instead of duplicating it.
+    Each field is length-prefixed so shifting bytes between adjacent fields
+    cannot produce the same ID.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for field in (tenant, filename, text):
+        data = field.encode()
+        h.update(len(data).to_bytes(4, "little"))
+        h.update(data)
+    h.update(idx.to_bytes(4, "little"))
+    return h.hexdigest()
+
+
+def _preview(text: str, limit: int = 200) -> str:
+    """Truncate text for a source preview, marking the cut with an ellipsis."""
+    return text if len(text) <= limit else text[:limit] + "..."
+
 
 class RAGService:
     """Service for RAG pipeline orchestration."""
@@ -21,6 +61,12 @@ class RAGService:
         self.model = genai.GenerativeModel(settings.gemini_model)
         self.max_tokens = settings.max_tokens
         self.temperature = settings.temperature
+        # Depends only on settings, so built once rather than per query
+        self._gen_config = genai.types.GenerationConfig(
+            max_output_tokens=self.max_tokens,
+            temperature=self.temperature,
+        )
+        
         logger.info(f"Initialized RAGService with Gemini model: {settings.gemini_model}")
     
     def upload_document(
@@ -73,22 +119,46 @@ class RAGService:
         """
         logger.info(f"Uploading {len(chunks)} chunks for tenant: {tenant_id}")
         
-        # Extract texts for batch embedding
-        texts = [chunk["text"] for chunk in chunks]
-        
         # Generate embeddings in batch
-        embeddings = embedding_service.generate_embeddings_batch(texts)
-        
-        # Store all chunks in Pinecone
-        document_ids = []
-        for chunk, embedding in zip(chunks, embeddings):
-            document_id = pinecone_service.upsert_document(
-                tenant_id=tenant_id,
-                text=chunk["text"],
-                embedding=embedding,
-                metadata=chunk.get("metadata", {})
-            )
-            document_ids.append(document_id)
+        embeddings = embedding_service.generate_embeddings_batch(
+            [chunk["text"] for chunk in chunks]
+        )
+        
+        return self.store_chunks(tenant_id, chunks, embeddings)
+    
+    def store_chunks(
+        self,
+        tenant_id: str,
+        chunks: List[Dict[str, Any]],
+        embeddings: Union[np.ndarray, List[np.ndarray]]
+    ) -> List[str]:
+        """
+        Store embedded chunks in the tenant's namespace.
+        
+        Args:
+            tenant_id: Tenant identifier
+            chunks: List of chunks with text and metadata
+            embeddings: Embedding vector for each chunk
+            
+        Returns:
+            List of document IDs
+        """
+        items = []
+        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+            metadata = chunk.get("metadata", {})
+            items.append({
+                "id": _chunk_id(
+                    tenant_id,
+                    chunk["text"],
+                    metadata.get("chunk_index", i),
+                    metadata.get("filename", "")
+                ),
+                "text": chunk["text"],
+                "embedding": embedding,
+                "metadata": metadata
+            })
+        
+        document_ids = pinecone_service.upsert_documents_batch(tenant_id, items)
         
         logger.info(f"Uploaded {len(document_ids)} chunks successfully")
         return document_ids
@@ -110,25 +180,15 @@ class RAGService:
         Returns:
             Dictionary with answer and sources
         """
-        if top_k is None:
-            top_k = settings.top_k_results
-        
         logger.info(f"Processing query for tenant: {tenant_id}")
         
-        # Step 1: Generate query embedding
-        query_embedding = embedding_service.generate_embedding(question)
-        
-        # Step 2: Retrieve relevant documents
-        documents = pinecone_service.query_documents(
-            tenant_id=tenant_id,
-            query_embedding=query_embedding,
-            top_k=top_k
-        )
+        # Steps 1-2: Embed the question and retrieve relevant documents
+        documents = self._retrieve(tenant_id, question, top_k)
         
         if not documents:
             logger.warning(f"No documents found for tenant: {tenant_id}")
             return {
-                "answer": "I don't have enough information to answer this question. Please upload relevant documents first.",
+                "answer": NO_DOCUMENTS_ANSWER,
                 "sources": [],
                 "question": question
             }
@@ -150,6 +210,85 @@ class RAGService:
             "question": question
         }
     
+    async def astream_query(
+        self,
+        tenant_id: str,
+        question: str,
+        top_k: int = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute RAG query for a tenant, streaming the answer as it is generated.
+        
+        Yields a {"sources": [...]} event first, then {"token": str} events
+        with answer text as Gemini produces it.
+        
+        Args:
+            tenant_id: Tenant identifier
+            question: User question
+            top_k: Number of documents to retrieve
+            
+        Yields:
+            Sources event followed by answer token events
+        """
+        logger.info(f"Processing streaming query for tenant: {tenant_id}")
+        
+        documents = await asyncio.to_thread(self._retrieve, tenant_id, question, top_k)
+        
+        # Sources are known before generation starts, so send them up front
+        yield {"sources": self._format_sources(documents)}
+        
+        if not documents:
+            logger.warning(f"No documents found for tenant: {tenant_id}")
+            yield {"token": NO_DOCUMENTS_ANSWER}
+            return
+        
+        prompt = self._build_prompt(question, self._build_context(documents))
+        try:
+            response = await self.model.generate_content_async(
+                prompt,
+                generation_config=self._gen_config,
+                stream=True
+            )
+            async for chunk in response:
+                if chunk.text:
+                    yield {"token": chunk.text}
+            
+        except Exception as e:
+            logger.error(f"Failed to stream answer with Gemini: {str(e)}")
+            raise
+        
+        logger.info(f"Streaming query completed for tenant: {tenant_id}")
+    
+    def _retrieve(
+        self,
+        tenant_id: str,
+        question: str,
+        top_k: int = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Embed a question and retrieve the tenant's most relevant documents.
+        
+        Args:
+            tenant_id: Tenant identifier
+            question: User question
+            top_k: Number of documents to retrieve
+            
+        Returns:
+            List of matching documents with metadata
+        """
+        if top_k is None:
+            top_k = settings.top_k_results
+        
+        # Whitespace is normalized first so repeated questions hit the
+        # embedding cache; the tokenizer ignores it anyway
+        query_embedding = embedding_service.generate_embedding(" ".join(question.split()))
+        
+        return pinecone_service.query_documents(
+            tenant_id=tenant_id,
+            query_embedding=query_embedding,
+            top_k=top_k
+        )
+    
     def _build_context(self, documents: List[Dict[str, Any]]) -> str:
         """
         Build context string from retrieved documents.
@@ -160,13 +299,10 @@ class RAGService:
         Returns:
             Formatted context string
         """
-        context_parts = []
-        for i, doc in enumerate(documents, 1):
-            text = doc.get("text", "")
-            score = doc.get("score", 0)
-            context_parts.append(f"[Document {i}] (Relevance: {score:.2f})\n{text}")
-        
-        return "\n\n".join(context_parts)
+        return "\n\n".join(
+            f"[Document {i}] (Relevance: {doc.get('score', 0):.2f})\n{doc.get('text', '')}"
+            for i, doc in enumerate(documents, 1)
+        )
     
     def _generate_answer(self, question: str, context: str) -> str:
         """
@@ -179,25 +315,12 @@ class RAGService:
         Returns:
             Generated answer
         """
-        prompt = f"""You are a helpful assistant that answers questions based on the provided context.
-Use only the information from the context to answer the question.
-If the context doesn't contain enough information to answer the question, say so clearly.
-Be concise and accurate in your responses.
-
-Context:
-{context}
-
-Question: {question}
-
-Answer:"""
+        prompt = self._build_prompt(question, context)
         
         try:
             response = self.model.generate_content(
                 prompt,
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=self.max_tokens,
-                    temperature=self.temperature,
-                )
+                generation_config=self._gen_config
             )
             
             answer = response.text.strip()
@@ -208,6 +331,19 @@ Answer:"""
             logger.error(f"Failed to generate answer with Gemini: {str(e)}")
             raise
     
+    def _build_prompt(self, question: str, context: str) -> str:
+        """
+        Build the Gemini prompt for a question and its retrieved context.
+        
+        Args:
+            question: User question
+            context: Retrieved context
+            
+        Returns:
+            Prompt text
+        """
+        return "".join((_PROMPT_PREFIX, context, "\n\nQuestion: ", question, "\n\nAnswer:"))
+    
     def _format_sources(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Format source documents for response.
@@ -218,14 +354,14 @@ Answer:"""
         Returns:
             Formatted source list
         """
-        sources = []
-        for doc in documents:
-            sources.append({
+        return [
+            {
                 "id": doc.get("id"),
-                "text": doc.get("text", "")[:200] + "...",  # Truncate for response
+                "text": _preview(doc.get("text", "")),
                 "score": round(doc.get("score", 0), 4)
-            })
-        return sources
+            }
+            for doc in documents
+        ]
 
 
 # Global RAG service instance
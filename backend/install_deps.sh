@@ -13,7 +13,7 @@ python3 -m pip install --upgrade pip
 # Stage 1: Core web framework
 echo ""
 echo "📦 Stage 1: Installing web framework..."
-pip install fastapi==0.109.0 uvicorn==0.27.0 gunicorn==21.2.0
+pip install fastapi==0.109.0 uvicorn==0.27.0 gunicorn==21.2.0 orjson==3.9.12
 
 # Stage 2: Configuration and validation
 echo ""
@@ -33,12 +33,12 @@ pip install google-generativeai==0.3.2
 # Stage 5: PDF processing
 echo ""
 echo "📦 Stage 5: Installing PDF tools..."
-pip install PyPDF2==3.0.1 python-multipart==0.0.6
+pip install PyMuPDF==1.23.21 python-multipart==0.0.6
 
 # Stage 6: Embeddings (this takes longest)
 echo ""
-echo "📦 Stage 6: Installing sentence-transformers (this may take a while)..."
-pip install sentence-transformers==2.3.1
+echo "📦 Stage 6: Installing fastembed..."
+pip install fastembed==0.3.6 numba==0.59.0
 
 # Stage 7: LangChain (install last to avoid conflicts)
 echo ""
@@ -48,7 +48,7 @@ pip install langchain==0.1.4 langchain-text-splitters==0.0.1
 # Stage 8: Logging and testing
 echo ""
 echo "📦 Stage 8: Installing utilities..."
-pip install structlog==24.1.0 pytest==7.4.4 pytest-asyncio==0.23.3 httpx==0.26.0
+pip install structlog==24.1.0 pytest==7.4.4 pytest-asyncio==0.23.3 httpx==0.26.0 sentence-transformers==2.3.1
 
 # Stage 9: Code quality tools
 echo ""
@@ -59,4 +59,4 @@ echo ""
 echo "✅ All packages installed successfully!"
 echo ""
 echo "📋 Installed packages:"
-pip list | grep -E "(fastapi|uvicorn|pinecone|google-generativeai|sentence-transformers|langchain|PyPDF2)"
+pip list | grep -E "(fastapi|uvicorn|pinecone|google-generativeai|fastembed|langchain|PyMuPDF)"
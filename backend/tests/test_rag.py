@@ -1,9 +1,22 @@
 """
 Basic tests for the multi-tenant RAG application.
 """
+import asyncio
+import os
+import signal
+import threading
+import time
+import fitz
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.core.security import SecurityError, validate_tenant_id
+from app.services import ingestion
+from app.services.ingestion import PipelineIngestor
+from app.services.pdf_parser import PDFParser, SimpleTextSplitter, pdf_parser
+from app.services.pinecone_service import PineconeService
+from app.services.rag_service import _chunk_id
 
 client = TestClient(app)
 
@@ -76,5 +89,167 @@ def test_query_empty_question():
     assert response.status_code == 422  # Validation error
 
 
+def test_validate_tenant_id():
+    """Test tenant ID character set and length validation."""
+    assert validate_tenant_id("  tenant_A-01 ") == "tenant_A-01"
+    for bad in ["ab", "a" * 65, "tenant.one", "ténant", "tenant id"]:
+        with pytest.raises(SecurityError):
+            validate_tenant_id(bad)
+
+
+def test_split_text_breaks_at_boundaries():
+    """Test splitter breaks at sentence boundaries and always makes progress."""
+    splitter = SimpleTextSplitter(chunk_size=100, chunk_overlap=20)
+    
+    chunks = splitter.split_text("Sentence one is here. " * 20)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    
+    # A lone early boundary must not stall the splitter
+    chunks = splitter.split_text("A. " + "x" * 250)
+    assert len(chunks) == 3
+
+
+def test_pdf_parser_recovers_from_dead_worker():
+    """Test extraction replaces the page pool after a worker process dies."""
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Hello pool")
+    pdf = doc.tobytes()
+    doc.close()
+    
+    try:
+        assert "Hello pool" in pdf_parser.extract_text_from_pdf(pdf, "a.pdf")
+        executor = PDFParser._get_executor()
+        os.kill(next(iter(executor._processes)), signal.SIGKILL)
+        deadline = time.monotonic() + 10
+        while not executor._broken and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert executor._broken
+        
+        assert "Hello pool" in pdf_parser.extract_text_from_pdf(pdf, "a.pdf")
+        assert PDFParser._get_executor() is not executor
+    finally:
+        PDFParser.shutdown()
+
+
+@pytest.fixture
+def fake_pipeline_services(monkeypatch):
+    """Replace PDF parsing, embedding and Pinecone calls with local fakes."""
+    stored = []
+    
+    async def fake_embed(texts):
+        return np.zeros((len(texts), 4), dtype=np.float16)
+    
+    def fake_store(tenant_id, chunks, embeddings):
+        stored.append(tenant_id)
+        return [f"{tenant_id}-{chunk['text']}" for chunk in chunks]
+    
+    monkeypatch.setattr(
+        ingestion.pdf_parser, "extract_text_from_pdf", lambda content, filename: content.decode()
+    )
+    monkeypatch.setattr(
+        ingestion.pdf_parser,
+        "chunk_pdf_text",
+        lambda text, filename, meta: [{"text": word, "metadata": {}} for word in text.split()]
+    )
+    monkeypatch.setattr(ingestion.embedding_service, "agenerate_embeddings_batch", fake_embed)
+    monkeypatch.setattr(ingestion.rag_service, "store_chunks", fake_store)
+    return monkeypatch
+
+
+def test_pipeline_survives_cancelled_upload(fake_pipeline_services):
+    """Test cancelling an upload mid-upsert does not stall later uploads."""
+    pipeline = PipelineIngestor(parse_workers=1)
+    upserting = threading.Event()
+    release = threading.Event()
+    store = ingestion.rag_service.store_chunks
+    
+    def slow_store(tenant_id, chunks, embeddings):
+        if tenant_id == "tenant-a":
+            upserting.set()
+            release.wait(5)
+        return store(tenant_id, chunks, embeddings)
+    
+    fake_pipeline_services.setattr(ingestion.rag_service, "store_chunks", slow_store)
+    
+    async def scenario():
+        task = asyncio.ensure_future(pipeline.ingest_pdf(b"one two", "a.pdf", "tenant-a"))
+        await asyncio.to_thread(upserting.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        try:
+            return await asyncio.wait_for(
+                pipeline.ingest_pdf(b"three", "b.pdf", "tenant-b"), timeout=5
+            )
+        finally:
+            await pipeline.stop()
+    
+    assert asyncio.run(scenario()) == ["tenant-b-three"]
+
+
+def test_pipeline_restarts_on_new_event_loop(fake_pipeline_services):
+    """Test the pipeline keeps working when used from a second event loop."""
+    pipeline = PipelineIngestor(parse_workers=1)
+    
+    async def upload(content):
+        return await asyncio.wait_for(pipeline.ingest_pdf(content, "a.pdf", "tenant"), timeout=5)
+    
+    assert asyncio.run(upload(b"one two")) == ["tenant-one", "tenant-two"]
+    assert asyncio.run(upload(b"three")) == ["tenant-three"]
+
+
+def test_embeddings_match_sentence_transformers():
+    """Test fastembed vectors match sentence-transformers for the same model."""
+    # Test-only dependency, installed from requirements.txt
+    from sentence_transformers import SentenceTransformer
+    from app.core.config import settings
+    from app.services.embeddings import embedding_service
+    
+    texts = [
+        "Pinecone namespaces isolate each tenant's vectors.",
+        # Longer than the 256-token limit, so truncation must match too
+        "Retrieval augmented generation grounds answers in documents. " * 60,
+    ]
+    reference = SentenceTransformer(settings.embedding_model).encode(
+        texts, normalize_embeddings=True
+    )
+    ours = embedding_service.generate_embeddings_batch(texts).astype(np.float32)
+    
+    cosine = np.sum(reference * ours, axis=1)
+    assert np.all(cosine > 0.999)
+
+
+def test_chunk_id_separates_fields():
+    """Test chunk IDs are stable and don't collide when bytes shift between fields."""
+    assert _chunk_id("tenant", "Xyz", 0, "a.pdf") == _chunk_id("tenant", "Xyz", 0, "a.pdf")
+    assert _chunk_id("tenant", "Xyz", 0, "a.pdf") != _chunk_id("tenant", "yz", 0, "a.pdfX")
+    assert _chunk_id("ab", "text", 0, "") != _chunk_id("a", "text", 0, "b")
+
+
+def test_concurrent_stats_share_one_refresh():
+    """Test concurrent stats callers share one describe_index_stats during writes."""
+    service = PineconeService()
+    calls = []
+    
+    class FakeIndex:
+        def describe_index_stats(self):
+            calls.append(1)
+            time.sleep(0.2)
+            # A write lands mid-call, so the result must not be cached
+            service._invalidate_stats()
+            return "stats"
+    
+    service.index = FakeIndex()
+    threads = [threading.Thread(target=service._describe_index_stats) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert service._stats_cache is None
+
+
 # Note: Integration tests requiring actual Pinecone/OpenAI connections
 # should be run separately with proper credentials and test namespaces